@@ -1,8 +1,10 @@
+import functools
 import itertools
-from typing import List, Dict, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, List, Dict, Optional, Set, Tuple
 import random
+import re
 import time
-import os
 
 def time_it(f):
     def wrapper(*args, **kwargs):
@@ -14,6 +16,47 @@ def time_it(f):
         return result
     return wrapper
 
+# Au-delà de ce nombre de feuilles, le vérificateur générique est utilisé plutôt qu'un code déroulé
+_MAX_UNROLLED_LEAVES = 32
+
+def _is_stable_row(
+    leaf_assignment: Tuple[int, ...],
+    activity_count: List[int],
+    pref_bits: List[List[int]],
+    pref_flat: List[int],
+    stride: int,
+    in_use_ids: List[int],
+    void_id: int,
+) -> bool:
+    """
+    Vérifie la stabilité des feuilles pour une assignation encodée en identifiants.
+    Fonction libre ne manipulant que des entiers et des listes : aucun accès aux attributs dans la boucle critique.
+    activity_count est un tampon réutilisé d'un appel à l'autre (remis à zéro ici) : la fonction n'est pas réentrante.
+    """
+    # Compte des participants pour chaque activité (indexé par identifiant)
+    for activity in range(len(activity_count)):
+        activity_count[activity] = 0
+    for activity in leaf_assignment:
+        activity_count[activity] += 1
+
+    # Masque des paires (activité, taille après déviation), calculé une seule fois à la première feuille void
+    deviation_mask = -1
+    for bits, flat, activity in zip(pref_bits, pref_flat, leaf_assignment):
+        if activity != void_id:
+            # Vérifier si la feuille est satisfaite de son assignation
+            if not (bits[activity] >> activity_count[activity]) & 1:
+                return False
+        else:
+            # Vérifier qu'une feuille en activité void ne veut pas dévier : un seul ET binaire par feuille
+            if deviation_mask < 0:
+                deviation_mask = 0
+                for alt_activity in in_use_ids:
+                    deviation_mask |= 1 << (alt_activity * stride + activity_count[alt_activity] + 1)
+            if flat & deviation_mask:
+                return False
+
+    return True
+
 class ColourCodingStarNetworkWithPreferences:
     def __init__(self, central_player: str, leaf_players: List[str], activities: List[str], preferences: Dict[str, List[Tuple[str, int]]]):
         """
@@ -25,139 +68,340 @@ class ColourCodingStarNetworkWithPreferences:
         self.preferences = preferences
         self.void_activity = "void"
 
+        # Internage des activités : chaque activité (void comprise) reçoit un petit identifiant entier
+        self._activity_names = list(dict.fromkeys(
+            [activity for activity in activities if activity != self.void_activity]
+            + [pref[0] for prefs in preferences.values() for pref in prefs]
+            + [self.void_activity]
+        ))
+        self._act_id = {activity: i for i, activity in enumerate(self._activity_names)}
+        self._void_id = self._act_id[self.void_activity]
+
+        # Préférences indexées : joueur -> {identifiant d'activité -> tailles acceptées}, dans l'ordre des préférences.
+        # Les listes de préférences ne sont parcourues qu'ici ; les tables ci-dessous en sont dérivées.
+        self._pref_set: Dict[str, Dict[int, Set[int]]] = {}
+        for player, prefs in preferences.items():
+            sizes_by_activity = self._pref_set[player] = {}
+            for activity, size in prefs:
+                sizes_by_activity.setdefault(self._act_id[activity], set()).add(size)
+
+        # Activités préférées (identifiants) de chaque feuille, indexées par position, sans doublon
+        self._leaf_pref_ids = [list(self._pref_set[leaf]) for leaf in leaf_players]
+        # Palettes des échantillonneurs : une entrée par préférence, dans l'ordre, doublons compris, pour qu'une
+        # activité listée avec plusieurs tailles soit tirée d'autant plus souvent
+        self._leaf_pref_palettes = [[self._act_id[pref[0]] for pref in preferences[leaf]] for leaf in leaf_players]
+
+        # Mots de bits [feuille][activité] : le bit k est levé si (activité, k) est préférée par la feuille.
+        # Une taille de groupe vaut au plus len(leaf_players) + 1 (déviation d'une feuille void).
+        max_size = len(leaf_players) + 1
+        self._pref_bits = []
+        for leaf in leaf_players:
+            bits = [0] * len(self._activity_names)
+            for activity, sizes in self._pref_set[leaf].items():
+                bits[activity] = sum(1 << size for size in sizes if 0 <= size <= max_size)
+            self._pref_bits.append(bits)
+
+        # Les mots de chaque feuille concaténés en un seul entier : la paire (a, k) est au bit a * stride + k
+        self._stride = max_size + 1
+        self._pref_flat = [
+            sum(word << (activity * self._stride) for activity, word in enumerate(bits)) for bits in self._pref_bits
+        ]
+
+        # Activités utilisées : celles des préférences du centre. C'est le seul ensemble essayé par la recherche,
+        # il est donc calculé une fois ici plutôt qu'à chaque appel.
+        self._activities_in_use = set(pref[0] for pref in preferences.get(central_player, []))
+        self._in_use_ids = tuple(sorted(self._act_id[activity] for activity in self._activities_in_use))
+
+        self._reset_caches()
+
+    def _reset_caches(self):
+        """
+        Crée les caches propres à l'instance.
+        """
+        # Mémoïsation des vérifications de stabilité, propre à l'instance : la même assignation des feuilles
+        # revient d'un guess du centre à l'autre lors de l'échantillonnage aléatoire.
+        self._stable_cache = functools.lru_cache(maxsize=1 << 20)(self._check_leaves)
+        # Vérificateurs spécialisés, générés à la demande par ensemble d'activités utilisées
+        self._checkers: Dict[Tuple[int, ...], Callable[[Tuple[int, ...]], bool]] = {}
+
+    def __getstate__(self):
+        # Les caches (lru_cache lié à l'instance, fonctions générées par exec) ne sont pas sérialisables :
+        # ils sont recréés dans chaque processus de travail
+        state = self.__dict__.copy()
+        del state["_stable_cache"]
+        del state["_checkers"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_caches()
+
     def guess_center_assignment(self) -> List[Tuple[str, int]]:
         """
         Génère toutes les paires (activité, taille) possibles pour le joueur central en se basant sur ses préférences.
         """
         return self.preferences.get(self.central_player, [])
-    
-    
-    def random_colouring(self, activities_in_use: Set[str]) -> List[Dict[str, str]]:
+
+    def _center_accepts(self, center_assignment: Tuple[str, int]) -> bool:
         """
-        Génère un ensemble de configurations aléatoires pour les feuilles.
+        Indique si le joueur central préfère la paire (activité, taille) devinée.
         """
-        possible_colours = list(activities_in_use) + [self.void_activity]
-        random_assignments = []
+        activity, size = center_assignment
+        activity_id = self._act_id.get(activity)
+        # La taille du centre n'est jamais comparée aux comptes : un test d'appartenance suffit, sans borne sur la taille
+        return size in self._pref_set.get(self.central_player, {}).get(activity_id, ())
 
-        for _ in range(100):
-            assignment = {leaf: random.choice(possible_colours) for leaf in self.leaf_players}
-            random_assignments.append(assignment)
+    def _colour_ids(self, activities_in_use: Set[str]) -> List[int]:
+        """
+        Convertit les activités utilisées en identifiants, void inclus.
+        """
+        return list(dict.fromkeys([self._act_id[activity] for activity in activities_in_use] + [self._void_id]))
 
-        return random_assignments
+    def _decode_assignment(self, center_activity: str, leaf_assignment: Tuple[int, ...]) -> Dict[str, str]:
+        """
+        Reconstruit l'assignation (joueur -> activité) à partir des identifiants des feuilles.
+        """
+        assignment = {leaf: self._activity_names[activity] for leaf, activity in zip(self.leaf_players, leaf_assignment)}
+        assignment[self.central_player] = center_activity
+        return assignment
+    
     
-    def random_colouring_opti(self, activities_in_use: Set[str], num_samples: int = 100) -> List[Dict[str, str]]:
+    def random_colouring(self, activities_in_use: Set[str], num_samples: int = 100) -> Iterator[Tuple[int, ...]]:
         """
-        Génère un ensemble de configurations aléatoires pour les feuilles, en tenant compte de leurs préférences.
+        Génère à la demande des configurations aléatoires pour les feuilles.
         """
-        random_assignments = []
+        possible_colours = self._colour_ids(activities_in_use)
+        num_leaves = len(self.leaf_players)
 
         for _ in range(num_samples):
-            assignment = {}
-            for leaf in self.leaf_players:
-                # Filtrer les activités disponibles selon les préférences de la feuille
-                preferred_activities = [pref[0] for pref in self.preferences[leaf] if pref[0] in activities_in_use]
-                possible_colours = preferred_activities + [self.void_activity]
-                # Choisir une activité aléatoire parmi les préférées (ou void)
-                assignment[leaf] = random.choice(possible_colours)
-            random_assignments.append(assignment)
+            yield tuple(random.choices(possible_colours, k=num_leaves))
+    
+    def random_colouring_opti(self, activities_in_use: Set[str], num_samples: int = 100) -> Iterator[Tuple[int, ...]]:
+        """
+        Génère à la demande des configurations aléatoires pour les feuilles, en tenant compte de leurs préférences.
+        Les tirages sont faits par colonne : un seul appel à random.choices par feuille pour tous les échantillons.
+        """
+        in_use_ids = {self._act_id[activity] for activity in activities_in_use}
+
+        columns = []
+        for leaf_index in range(len(self.leaf_players)):
+            # Filtrer les activités disponibles selon les préférences de la feuille (ou void)
+            possible_colours = [a for a in self._leaf_pref_palettes[leaf_index] if a in in_use_ids] + [self._void_id]
+            columns.append(random.choices(possible_colours, k=num_samples))
 
-        return random_assignments
+        yield from zip(*columns) if columns else itertools.repeat((), num_samples)
 
 
 
-    def exhaustive_colouring(self, activities_in_use: Set[str]) -> List[Dict[str, str]]:
+    def exhaustive_colouring(self, activities_in_use: Set[str]) -> List[Tuple[int, ...]]:
         """
         Génère toutes les assignations possibles (non aléatoires) pour les feuilles.
         """
-        possible_colours = list(activities_in_use) + [self.void_activity]
-        return [
-            dict(zip(self.leaf_players, colouring))
-            for colouring in itertools.product(possible_colours, repeat=len(self.leaf_players))
-        ]
+        possible_colours = self._colour_ids(activities_in_use)
+        return list(itertools.product(possible_colours, repeat=len(self.leaf_players)))
     
-    def exhaustive_colouring_opti(self, activities_in_use: Set[str]) -> List[Dict[str, str]]:
+    def exhaustive_colouring_opti(self, activities_in_use: Set[str]) -> List[Tuple[int, ...]]:
         """
         Génère toutes les assignations possibles pour les feuilles, en tenant compte de leurs préférences.
         """
         # Préparer les options possibles pour chaque feuille en filtrant selon ses préférences
+        in_use_ids = {self._act_id[activity] for activity in activities_in_use}
         all_options = []
-        for leaf in self.leaf_players:
-            preferred_activities = [pref[0] for pref in self.preferences[leaf] if pref[0] in activities_in_use]
-            possible_colours = preferred_activities + [self.void_activity]
+        for leaf_index in range(len(self.leaf_players)):
+            preferred_activities = [a for a in self._leaf_pref_palettes[leaf_index] if a in in_use_ids]
+            possible_colours = preferred_activities + [self._void_id]
             all_options.append(possible_colours)
 
         # Générer toutes les combinaisons possibles des options filtrées
+        return list(itertools.product(*all_options))
+
+    def _leaf_options(self, in_use_ids: List[int]) -> List[List[int]]:
+        """
+        Options de chaque feuille pour le retour arrière : ses activités préférées parmi celles utilisées, void en dernier.
+        """
+        void_id = self._void_id
+        in_use = set(in_use_ids)
         return [
-            dict(zip(self.leaf_players, colouring))
-            for colouring in itertools.product(*all_options)
-    ]
+            [activity for activity in self._leaf_pref_ids[i] if activity in in_use and activity != void_id] + [void_id]
+            for i in range(len(self.leaf_players))
+        ]
+
+    def backtrack_colouring(self, in_use_ids: List[int], first_activity: Optional[int] = None) -> Iterator[Tuple[int, ...]]:
+        """
+        Énumère les assignations des feuilles par retour arrière, feuille par feuille.
+        Une feuille ne reçoit que void ou une activité qu'elle préfère. Pour chaque groupe déjà commencé, on garde
+        les tailles acceptées par tous ses membres, et une branche est élaguée dès qu'aucune de ces tailles ne reste
+        atteignable avec les feuilles suivantes pouvant encore rejoindre le groupe.
+
+        :param first_activity: Si donné, seule la branche où la première feuille joue cette activité est parcourue.
+        """
+        num_leaves = len(self.leaf_players)
+        num_activities = len(self._activity_names)
+        void_id = self._void_id
+        pref_bits = self._pref_bits
+        options = self._leaf_options(in_use_ids)
+        if first_activity is not None and num_leaves:
+            options[0] = [activity for activity in options[0] if activity == first_activity]
+
+        # reach[i][a] : nombre de feuilles d'indice >= i qui peuvent encore choisir l'activité a
+        reach = [[0] * num_activities for _ in range(num_leaves + 1)]
+        for i in range(num_leaves - 1, -1, -1):
+            reach[i][:] = reach[i + 1]
+            for activity in options[i][:-1]:
+                reach[i][activity] += 1
+
+        # Parcours itératif avec une pile explicite d'entiers plutôt que des générateurs récursifs :
+        # row[idx] vaut -1 tant que la feuille idx n'est pas assignée, cursor[idx] est sa prochaine option à essayer
+        # et saved_sizes[idx] les tailles acceptées du groupe de son activité avant son assignation.
+        # sizes[a] est le ET des mots de préférences des feuilles du groupe a (-1 : groupe vide, aucune contrainte).
+        counts = [0] * num_activities
+        sizes = [-1] * num_activities
+        row = [-1] * num_leaves
+        cursor = [0] * num_leaves
+        saved_sizes = [0] * num_leaves
+
+        idx = 0
+        while idx >= 0:
+            if idx == num_leaves:
+                yield tuple(row)
+                idx -= 1
+                continue
+
+            # Annuler le choix précédent de la feuille idx
+            activity = row[idx]
+            if activity >= 0 and activity != void_id:
+                counts[activity] -= 1
+                sizes[activity] = saved_sizes[idx]
+
+            leaf_options = options[idx]
+            next_reach = reach[idx + 1]
+            k = cursor[idx]
+            while k < len(leaf_options):
+                activity = leaf_options[k]
+                k += 1
+                if activity != void_id:
+                    # Une taille acceptée par tout le groupe doit rester atteignable en comptant cette feuille
+                    new_sizes = sizes[activity] & pref_bits[idx][activity]
+                    if not (new_sizes >> (counts[activity] + 1)) & ((2 << next_reach[activity]) - 1):
+                        continue
+                # Les autres groupes commencés que la feuille aurait pu rejoindre perdent un candidat
+                if any(
+                    counts[other] and not (sizes[other] >> counts[other]) & ((2 << next_reach[other]) - 1)
+                    for other in leaf_options
+                    if other != activity and other != void_id
+                ):
+                    continue
+                if activity != void_id:
+                    saved_sizes[idx] = sizes[activity]
+                    counts[activity] += 1
+                    sizes[activity] = new_sizes
+                break
+            else:
+                # Options épuisées : remonter d'une feuille
+                row[idx] = -1
+                idx -= 1
+                continue
+
+            cursor[idx] = k
+            row[idx] = activity
+            idx += 1
+            if idx < num_leaves:
+                cursor[idx] = 0
+                row[idx] = -1
 
     
-    def heuristic_colouring(self, activities_in_use: Set[str], num_samples: int = 100) -> List[Dict[str, str]]:
+    def heuristic_colouring(self, activities_in_use: Set[str], num_samples: int = 100) -> Iterator[Tuple[int, ...]]:
         """
-        Génère un ensemble de configurations basées sur une heuristique pondérant les activités préférées.
+        Génère à la demande des configurations basées sur une heuristique pondérant les activités préférées.
+        Les tirages sont faits par colonne : un seul appel à random.choices par feuille pour tous les échantillons.
         """
-        heuristic_assignments = []
+        columns = []
+        for leaf in self.leaf_players:
+            # Récupérer les activités préférées et pondérer selon leur rang
+            preferred_activities = [self._act_id[pref[0]] for pref in self.preferences[leaf] if pref[0] in activities_in_use]
+            weights = [len(self.preferences[leaf]) - i for i in range(len(preferred_activities))]
 
-        for _ in range(num_samples):
-            assignment = {}
-            for leaf in self.leaf_players:
-                # Récupérer les activités préférées et pondérer selon leur rang
-                preferred_activities = [pref[0] for pref in self.preferences[leaf] if pref[0] in activities_in_use]
-                weights = [len(self.preferences[leaf]) - i for i in range(len(preferred_activities))]
-                
-                # Inclure l'option "void" avec une pondération minimale
-                possible_colours = preferred_activities + [self.void_activity]
-                weights.append(1)  # Ajouter une pondération pour "void"
-                
-                # Choisir une activité pondérée
-                assignment[leaf] = random.choices(possible_colours, weights=weights)[0]
-            
-            heuristic_assignments.append(assignment)
-
-        return heuristic_assignments
+            # Inclure l'option "void" avec une pondération minimale
+            possible_colours = preferred_activities + [self._void_id]
+            weights.append(1)  # Ajouter une pondération pour "void"
+
+            # Choisir les activités pondérées de la feuille pour tous les échantillons
+            columns.append(random.choices(possible_colours, weights=weights, k=num_samples))
+
+        yield from zip(*columns) if columns else itertools.repeat((), num_samples)
 
     def is_assignment_stable(
-        self, center_assignment: Tuple[str, int], activities_in_use: Set[str], leaf_assignment: Dict[str, str]
+        self, center_assignment: Tuple[str, int], in_use_ids: List[int], leaf_assignment: Tuple[int, ...]
     ) -> bool:
         """
         Vérifie si une assignation est compatible et stable en respectant les préférences des joueurs.
-        """
-        # print(f"Testing stability for: center={center_assignment}, leaves={leaf_assignment}")
-        
-        # Compte des participants pour chaque activité
-        activity_count = {activity: 0 for activity in activities_in_use}
-        activity_count[self.void_activity] = 0
-
-        # Assurer que l'activité centrale est incluse dans le comptage
-        center_activity = center_assignment[0]
-        if center_activity not in activity_count:
-            activity_count[center_activity] = 0
-
-        # Calculer le nombre de participants par activité
-        for leaf, activity in leaf_assignment.items():
-            activity_count[activity] += 1
 
+        :param center_assignment: Assignation (activité, taille) du centre.
+        :param in_use_ids: Identifiants des activités utilisées.
+        :param leaf_assignment: Identifiant de l'activité de chaque feuille, dans l'ordre de leaf_players.
+        """
         # Vérifier si le joueur central est satisfait de son assignation
-        center_group_size = center_assignment[1]
-        if (center_activity, center_group_size) not in self.preferences[self.central_player]:
+        if not self._center_accepts(center_assignment):
             return False
 
-        # Vérifier si les feuilles sont satisfaites de leurs assignations
-        for leaf, activity in leaf_assignment.items():
-            group_size = activity_count[activity]
-            if (activity, group_size) not in self.preferences[leaf] and activity != self.void_activity:
-                return False
+        return self._stable_cache(tuple(in_use_ids), tuple(leaf_assignment))
 
-        # Vérifier qu'aucune feuille en activité void ne veut dévier
-        for leaf, activity in leaf_assignment.items():
-            if activity == self.void_activity:
-                for alt_activity in activities_in_use:
-                    new_group_size = activity_count[alt_activity] + 1
-                    if (alt_activity, new_group_size) in self.preferences[leaf]:
-                        return False
+    def _check_leaves(self, in_use_ids: Tuple[int, ...], leaf_assignment: Tuple[int, ...]) -> bool:
+        """
+        Vérifie la stabilité des feuilles ; les arguments sont hachables pour être mémoïsés par _stable_cache.
+        """
+        return self._checker(in_use_ids)(leaf_assignment)
 
-        return True
+    def _checker(self, in_use_ids: Tuple[int, ...]) -> Callable[[Tuple[int, ...]], bool]:
+        """
+        Retourne le vérificateur de stabilité des feuilles pour un ensemble d'activités utilisées.
+        Le nombre de feuilles, les identifiants et les mots de préférences étant figés après __init__, le code est
+        généré une fois par ensemble, avec la boucle sur les feuilles déroulée et les constantes en littéraux.
+        """
+        checker = self._checkers.get(in_use_ids)
+        if checker is not None:
+            return checker
+
+        num_leaves = len(self.leaf_players)
+        if not 0 < num_leaves <= _MAX_UNROLLED_LEAVES:
+            checker = functools.partial(
+                _is_stable_row,
+                activity_count=[0] * len(self._activity_names),
+                pref_bits=self._pref_bits,
+                pref_flat=self._pref_flat,
+                stride=self._stride,
+                in_use_ids=in_use_ids,
+                void_id=self._void_id,
+            )
+        else:
+            stride, void_id = self._stride, self._void_id
+            # Le tampon de comptage c est alloué une fois, à la définition de la fonction, puis remis à zéro à chaque appel
+            num_activities = len(self._activity_names)
+            lines = [
+                f"def check(leaf_assignment, c=[0] * {num_activities}, zeros=(0,) * {num_activities}):",
+                f"    {', '.join(f'r{i}' for i in range(num_leaves))}, = leaf_assignment",
+                "    c[:] = zeros",
+            ]
+            lines += [f"    c[r{i}] += 1" for i in range(num_leaves)]
+            # Masque des paires (activité, taille après déviation) pour les feuilles void
+            deviation_terms = [f"(1 << (c[{a}] + {a * stride + 1}))" for a in in_use_ids]
+            lines.append(f"    m = {' | '.join(deviation_terms) or '0'}")
+            for i, flat in enumerate(self._pref_flat):
+                if not flat:
+                    # Feuille sans préférence : elle ne peut être que void et ne dévie jamais
+                    lines.append(f"    if r{i} != {void_id}: return False")
+                    continue
+                lines.append(f"    if r{i} == {void_id}:")
+                lines.append(f"        if {flat} & m: return False")
+                lines.append(f"    elif not ({flat} >> (r{i} * {stride} + c[r{i}])) & 1: return False")
+            lines.append("    return True")
+
+            namespace = {}
+            exec(compile("\n".join(lines), "<checker>", "exec"), namespace)
+            checker = namespace["check"]
+
+        self._checkers[in_use_ids] = checker
+        return checker
     
     @time_it
     def find_nash_stable_assignment(self) -> Dict[str, str]:
@@ -165,43 +409,71 @@ class ColourCodingStarNetworkWithPreferences:
         Cherche une assignation stable de Nash en utilisant la technique du colour-coding.
         """
         center_guesses = self.guess_center_assignment()
-        activity_guesses = [set(pref[0] for pref in self.preferences[self.central_player])]
+        activities_in_use, in_use_ids = self._activities_in_use, self._in_use_ids
+        is_stable = self._stable_cache
 
         for center_assignment in center_guesses:
-            for activities_in_use in activity_guesses:
-                random_colours = self.random_colouring(activities_in_use)
-                for colouring in random_colours:
-                    if self.is_assignment_stable(center_assignment, activities_in_use, colouring):
-                        return {**colouring, self.central_player: center_assignment[0]}
+            # Le test du centre ne dépend pas des colourings : il est fait une fois par guess
+            if not self._center_accepts(center_assignment):
+                continue
+            for colouring in self.random_colouring(activities_in_use):
+                if is_stable(in_use_ids, colouring):
+                    return self._decode_assignment(center_assignment[0], colouring)
 
         return None
     
     @time_it
-    def find_all_nash_stable_assignments(self) -> List[Dict[str, str]]:
+    def find_all_nash_stable_assignments(self, max_workers: int = 1) -> List[Dict[str, str]]:
         """
-        Trouve toutes les assignations stables de Nash en utilisant la méthode exhaustive_colouring.
+        Trouve toutes les assignations stables de Nash en utilisant la méthode backtrack_colouring.
+        Les assignations stables des feuilles ne dépendent pas du guess du centre : elles sont énumérées une seule
+        fois, puis croisées avec chaque guess accepté par le centre.
 
+        :param max_workers: Nombre de processus entre lesquels répartir les branches de la première feuille
+            (1 par défaut : recherche séquentielle, plus rapide sur les petites instances).
         :return: Liste de toutes les assignations stables de Nash trouvées.
         """
-        stable_assignments = []
-        center_guesses = self.guess_center_assignment()
-        activity_guesses = [set(pref[0] for pref in self.preferences[self.central_player])]
+        center_guesses = [
+            center_assignment for center_assignment in self.guess_center_assignment()
+            # Le test du centre ne dépend pas des colourings : il est fait une fois par guess
+            if self._center_accepts(center_assignment)
+        ]
+        if not center_guesses:
+            return []
 
-        for center_assignment in center_guesses:
-            for activities_in_use in activity_guesses:
-                all_colours = self.exhaustive_colouring(activities_in_use)
-                for colouring in all_colours:
-                    if self.is_assignment_stable(center_assignment, activities_in_use, colouring):
-                        stable_assignment = {**colouring, self.central_player: center_assignment[0]}
-                        stable_assignments.append(stable_assignment)
+        branches = self._leaf_options(self._in_use_ids)[0] if self.leaf_players else []
+        if max_workers <= 1 or len(branches) <= 1:
+            stable_rows = self._stable_leaf_rows()
+        else:
+            # Les branches sont concaténées dans l'ordre des options : même ordre que le parcours séquentiel
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(branches))) as executor:
+                stable_rows = list(itertools.chain.from_iterable(executor.map(self._stable_leaf_rows, branches)))
+
+        return [
+            self._decode_assignment(center_assignment[0], colouring)
+            for center_assignment in center_guesses
+            for colouring in stable_rows
+        ]
 
-        return stable_assignments
+    def _stable_leaf_rows(self, first_activity: Optional[int] = None) -> List[Tuple[int, ...]]:
+        """
+        Énumère les assignations stables des feuilles, éventuellement restreintes à une branche de la première feuille.
+        """
+        all_colours = self.backtrack_colouring(self._in_use_ids, first_activity)
+        # Filtrer les candidats en une passe (boucle pilotée en C par filter)
+        return list(filter(self._checker(self._in_use_ids), all_colours))
 
 
+# Expressions du format .test, compilées une fois : en-têtes d'une ligne, début de la section des préférences
+# et ligne "joueur: préférences" (hors commentaires)
+_HEADER_RE = re.compile(r"^[ \t]*(central_player|leaf_players|activities):(.*)$", re.M)
+_PREFERENCES_RE = re.compile(r"^[ \t]*preferences:.*$", re.M)
+_PLAYER_RE = re.compile(r"^(?![ \t]*#)[ \t]*([^:\n]*):(.*)$", re.M)
 
 def parse_test_file(file_path: str) -> Tuple[str, List[str], List[str], Dict[str, List[Tuple[str, int]]]]:
     """
     Parse un fichier .test pour générer la configuration du réseau en étoile avec des préférences.
+    Le fichier est lu d'un bloc et découpé par expressions régulières plutôt que ligne par ligne.
     """
     central_player = ""
     leaf_players = []
@@ -209,40 +481,32 @@ def parse_test_file(file_path: str) -> Tuple[str, List[str], List[str], Dict[str
     preferences = {}
 
     with open(file_path, "r") as file:
-        for line in file:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-
-            if line.startswith("central_player:"):
-                central_player = line.split(":", 1)[1].strip()
-
-            elif line.startswith("leaf_players:"):
-                leaf_players = [player.strip() for player in line.split(":", 1)[1].split(",")]
+        source = file.read()
 
-            elif line.startswith("activities:"):
-                activities = [activity.strip() for activity in line.split(":", 1)[1].split(",")]
+    # Tout ce qui suit l'en-tête "preferences:" appartient à la section des préférences
+    section = _PREFERENCES_RE.search(source)
+    header_part, preference_part = (source[:section.start()], source[section.end():]) if section else (source, "")
 
-            elif line.startswith("preferences:"):
-                for preference_line in file:
-                    preference_line = preference_line.strip()
-                    if not preference_line or preference_line.startswith("#"):
-                        continue
-
-                    if ":" in preference_line:
-                        player, prefs = preference_line.split(":", 1)
-                        player = player.strip()
+    for key, value in _HEADER_RE.findall(header_part):
+        if key == "central_player":
+            central_player = value.strip()
+        elif key == "leaf_players":
+            leaf_players = [player.strip() for player in value.split(",")]
+        else:
+            activities = [activity.strip() for activity in value.split(",")]
 
-                        preferences[player] = []
-                        for pref in prefs.split(">"):
-                            activity, num = pref.strip(" ()").split(",")
-                            preferences[player].append((activity.strip(), int(num.strip())))
+    for player, prefs in _PLAYER_RE.findall(preference_part):
+        # Chaque segment entre ">" est une paire, parenthèses facultatives ; un segment mal formé lève ValueError
+        player = player.strip()
+        preferences[player] = []
+        for pref in prefs.strip().split(">"):
+            activity, num = pref.strip(" ()").split(",")
+            preferences[player].append((activity.strip(), int(num.strip())))
 
     return central_player, leaf_players, activities, preferences
 
 
 
-
 if __name__ == "__main__":
     test_file_path = "tests/test_4.test"
 
@@ -1,5 +1,110 @@
+import collections
+import functools
 import itertools
-from typing import List, Dict, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Dict, Optional, Sequence, Tuple
+
+# Nombre de paires (centre, combinaison) confiées à chaque tâche de la recherche parallèle
+_PAIRS_PER_TASK = 100
+
+
+def _stable_from_counts(
+    counts: Sequence[int], center_activity: int, center_group_size: int, activities_in_use: int, void_id: int
+) -> bool:
+    """
+    Vérifie la stabilité à partir des comptes de feuilles par identifiant d'activité (void vaut void_id).
+    La stabilité ne dépend que de ces comptes et non des feuilles qui jouent chaque activité.
+    """
+    # Vérifier les contraintes pour le joueur central
+    if counts[center_activity] != center_group_size:
+        return False
+
+    # Vérifier que chaque activité utilisée, sauf celle du centre, est assignée à une seule feuille :
+    # seuls les bits levés du masque sont parcourus
+    remaining = activities_in_use & ~(1 << center_activity)
+    while remaining:
+        lowest_bit = remaining & -remaining
+        if counts[lowest_bit.bit_length() - 1] != 1:
+            return False
+        remaining ^= lowest_bit
+
+    # Vérifier qu'aucune feuille en activité void ne veut dévier
+    if counts[void_id]:
+        remaining = activities_in_use
+        while remaining:
+            lowest_bit = remaining & -remaining
+            if counts[lowest_bit.bit_length() - 1] < 2:
+                return False
+            remaining ^= lowest_bit
+
+    return True
+
+
+def _is_feasible(center_group_size: int, num_others: int, num_leaves: int) -> bool:
+    """
+    Condition arithmétique nécessaire à la stabilité, indépendante de l'assignation des feuilles.
+    center_group_size feuilles jouent l'activité centrale, une feuille chacune des num_others autres activités
+    utilisées, les feuilles restantes jouent void ; des feuilles void n'existent que si aucune autre activité n'est
+    utilisée et que le groupe central compte au moins deux feuilles, sinon elles voudraient dévier.
+    """
+    remaining = num_leaves - center_group_size - num_others
+    if remaining < 0:
+        return False
+    return remaining == 0 or (num_others == 0 and center_group_size >= 2)
+
+
+def _is_stable(
+    leaf_assignment: Sequence[int], center_activity: int, center_group_size: int, activities_in_use: int, void_id: int
+) -> bool:
+    """
+    Vérifie la stabilité d'une assignation encodée en identifiants d'activités (void vaut void_id).
+    Fonction libre sur des entiers uniquement : un seul passage pour compter, puis les trois tests.
+    """
+    # Test le moins coûteux d'abord : la taille du groupe central rejette la plupart des assignations avant
+    # tout comptage complet
+    if leaf_assignment.count(center_activity) != center_group_size:
+        return False
+
+    counts = [0] * (void_id + 1)
+    for activity in leaf_assignment:
+        counts[activity] += 1
+    return _stable_from_counts(counts, center_activity, center_group_size, activities_in_use, void_id)
+
+
+def _representative(
+    activities_in_use: int, center_activity: int, center_group_size: int, num_leaves: int, void_id: int
+) -> Tuple[int, ...]:
+    """
+    Construit l'assignation représentative d'une paire (centre, combinaison) : les
+    premières feuilles jouent l'activité centrale, les suivantes une autre activité utilisée chacune dans l'ordre
+    des identifiants, les dernières void.
+    """
+    other_activities = []
+    remaining = activities_in_use & ~(1 << center_activity)
+    while remaining:
+        lowest_bit = remaining & -remaining
+        other_activities.append(lowest_bit.bit_length() - 1)
+        remaining ^= lowest_bit
+    num_voids = num_leaves - center_group_size - len(other_activities)
+    return (center_activity,) * center_group_size + tuple(other_activities) + (void_id,) * num_voids
+
+
+def _search_pairs(
+    pairs: List[Tuple[int, int, int]], num_leaves: int, void_id: int
+) -> Optional[Tuple[int, Tuple[int, ...]]]:
+    """
+    Cherche dans un lot de paires (activité centrale, taille, combinaison) la première qui admet une assignation
+    stable. Fonction libre sur des entiers uniquement, exécutable dans un processus séparé.
+
+    :return: (activité centrale, assignation des feuilles) ou None si aucune paire du lot ne convient.
+    """
+    for center_activity, center_group_size, activities_in_use in pairs:
+        # Toutes les assignations canoniques d'une paire ont les mêmes comptes : le prédicat n'est évalué qu'une
+        # fois par paire, sur le représentant de l'orbite
+        leaf_assignment = _representative(activities_in_use, center_activity, center_group_size, num_leaves, void_id)
+        if _is_stable(leaf_assignment, center_activity, center_group_size, activities_in_use, void_id):
+            return center_activity, leaf_assignment
+    return None
 
 
 class ColourCodingStarNetwork:
@@ -15,92 +120,167 @@ class ColourCodingStarNetwork:
         self.leaf_players = leaf_players
         self.activities = activities
         self.void_activity = "void"
+        # Identifiants entiers des activités ; void prend l'identifiant qui suit la dernière activité
+        self._act_id = {activity: i for i, activity in enumerate(activities)}
+        self._void_id = len(activities)
+        # Tailles figées, lues par les boucles de recherche sans rappeler len()
+        self._num_leaves = len(leaf_players)
+        self._num_activities = len(activities)
+        self._activity_names = list(activities) + [self.void_activity]
 
-    def guess_center_assignment(self) -> List[Tuple[str, int]]:
+    def guess_center_assignment(self) -> Iterator[Tuple[str, int]]:
         """
-        Génère toutes les paires (activité, taille) possibles pour le joueur central.
+        Génère à la demande toutes les paires (activité, taille) possibles pour le joueur central.
         """
-        guesses = []
         for activity in self.activities:
-            for k in range(1, len(self.leaf_players) + 2):  # Taille maximale inclut le joueur central.
-                guesses.append((activity, k))
-        return guesses
+            for k in range(1, self._num_leaves + 2):  # Taille maximale inclut le joueur central.
+                yield (activity, k)
 
-    def guess_activities_in_use(self) -> List[Set[str]]:
+    def guess_activities_in_use(self) -> range:
         """
         Génère toutes les combinaisons possibles des activités utilisées par les feuilles.
+        Chaque combinaison est un masque de bits : le bit i est levé si self.activities[i] est utilisée.
         """
-        activity_sets = []
-        for size in range(1, len(self.activities) + 1):  # Au moins une activité doit être utilisée.
-            activity_sets.extend(itertools.combinations(self.activities, size))
-        return [set(activity_set) for activity_set in activity_sets]
+        return range(1, 1 << self._num_activities)  # Au moins une activité doit être utilisée.
 
-    def random_colouring(self, activities_in_use: Set[str]) -> List[Dict[str, str]]:
+    def _guess_compatible_activities(self) -> Iterator[int]:
+        """
+        Génère directement les seules combinaisons (masques de bits) compatibles avec une assignation stable.
+        Une assignation stable place au moins une feuille sur l'activité centrale et exactement une feuille sur chaque
+        autre activité utilisée : une combinaison compte donc au plus len(leaf_players) activités. Les combinaisons
+        sont produites par taille croissante, en nombre polynomial en K pour L fixé.
+        """
+        activity_bits = [1 << i for i in range(self._num_activities)]
+        for size in range(1, min(self._num_activities, self._num_leaves) + 1):
+            for combination in itertools.combinations(activity_bits, size):
+                yield sum(combination)
+
+    def _iter_activities(self, activities_in_use: int) -> Iterator[str]:
+        """
+        Parcourt les activités présentes dans un masque de bits.
         """
-        Génère des assignations aléatoires de couleurs (activités) aux feuilles.
+        while activities_in_use:
+            lowest_bit = activities_in_use & -activities_in_use
+            yield self.activities[lowest_bit.bit_length() - 1]
+            activities_in_use ^= lowest_bit
 
-        :param activities_in_use: Ensemble des activités à assigner.
-        :return: Liste d'assignations aléatoires (feuille -> activité).
+    def iter_colourings(self, activities_in_use: int) -> Iterator[Tuple[int, ...]]:
         """
-        possible_colours = list(activities_in_use) + [self.void_activity]
-        random_assignments = []
-        for _ in range(100):  # Limitation pour tester différentes assignations.
-            assignment = {leaf: possible_colours[i % len(possible_colours)] for i, leaf in enumerate(self.leaf_players)}
-            random_assignments.append(assignment)
-        return random_assignments
+        Énumère à la demande toutes les assignations de couleurs (activités) aux feuilles.
+        La recherche passe par iter_candidates ; cette énumération exhaustive est conservée comme API publique.
+
+        :param activities_in_use: Masque de bits des activités à assigner.
+        :return: Itérateur paresseux d'assignations (identifiant d'activité de chaque feuille, dans l'ordre de
+            leaf_players), pour s'arrêter au premier succès.
+        """
+        possible_colours = [self._act_id[activity] for activity in self._iter_activities(activities_in_use)]
+        return itertools.product(possible_colours + [self._void_id], repeat=self._num_leaves)
+
+    def canonical_representative(
+        self, activities_in_use: int, center_activity: int, center_group_size: int
+    ) -> Tuple[int, ...]:
+        """
+        Construit l'assignation représentative d'une paire (centre, combinaison) : les premières feuilles jouent
+        l'activité centrale, les suivantes une autre activité utilisée chacune dans l'ordre des identifiants, les
+        dernières void. Les feuilles étant interchangeables pour la stabilité, elle vaut pour toutes les assignations
+        ayant les mêmes comptes.
+        """
+        return _representative(
+            activities_in_use, center_activity, center_group_size, self._num_leaves, self._void_id
+        )
 
     def is_assignment_stable(
-        self, center_assignment: Tuple[str, int], activities_in_use: Set[str], leaf_assignment: Dict[str, str]
+        self, center_assignment: Tuple[str, int], activities_in_use: int, leaf_assignment: Sequence[int]
     ) -> bool:
         """
         Vérifie si une assignation est compatible et stable.
 
         :param center_assignment: Assignation (activité, taille) du centre.
-        :param activities_in_use: Ensemble des activités utilisées.
-        :param leaf_assignment: Assignation des feuilles (feuille -> activité).
+        :param activities_in_use: Masque de bits des activités utilisées.
+        :param leaf_assignment: Identifiant de l'activité de chaque feuille, dans l'ordre de leaf_players.
         :return: True si stable, False sinon.
         """
-        activity_count = {activity: 0 for activity in activities_in_use}
-        activity_count[self.void_activity] = 0
-
-        # Calculer le nombre de participants par activité
-        for leaf, activity in leaf_assignment.items():
-            activity_count[activity] += 1
-
-        # Vérifier les contraintes pour le joueur central
+        # L'activité centrale doit faire partie des activités utilisées
         center_activity, center_group_size = center_assignment
-        if activity_count[center_activity] != center_group_size:
+        center_id = self._act_id[center_activity]
+        if not (activities_in_use >> center_id) & 1:
             return False
 
-        # Vérifier que chaque activité est assignée à une seule feuille, sauf void
-        for activity in activities_in_use:
-            if activity_count[activity] != 1 and activity != center_activity:
-                return False
+        # Les comptes sont tenus dans une liste indexée par identifiant d'activité
+        return _is_stable(leaf_assignment, center_id, center_group_size, activities_in_use, self._void_id)
 
-        # Vérifier qu'aucune feuille en activité void ne veut dévier
-        for leaf, activity in leaf_assignment.items():
-            if activity == self.void_activity:
-                for alt_activity in activities_in_use:
-                    if alt_activity != self.void_activity and activity_count[alt_activity] < 2:
-                        return False
+    def iter_pairs(self) -> Iterator[Tuple[int, int, int]]:
+        """
+        Énumère à plat les paires (activité centrale, taille, combinaison) structurellement réalisables.
+        Les combinaisons sont l'axe extérieur : le nombre d'autres activités n'y est calculé qu'une fois, et le test
+        de faisabilité écarte les paires avant toute assignation.
+        """
+        # Tailles devinées pour chaque activité centrale, dans l'ordre de guess_center_assignment
+        center_sizes: Dict[int, List[int]] = {}
+        for activity, size in self.guess_center_assignment():
+            center_sizes.setdefault(self._act_id[activity], []).append(size)
+        num_leaves = self._num_leaves
+        return (
+            (center_id, size, activities_in_use)
+            for activities_in_use in self._guess_compatible_activities()
+            for num_others in (bin(activities_in_use).count("1") - 1,)
+            for center_id, sizes in center_sizes.items()
+            if (activities_in_use >> center_id) & 1
+            for size in sizes
+            if _is_feasible(size, num_others, num_leaves)
+        )
 
-        return True
+    def iter_candidates(self) -> Iterator[Tuple[int, int, int, Tuple[int, ...]]]:
+        """
+        Énumère à plat tous les candidats (activité centrale, taille, combinaison, assignation des feuilles).
+        Une seule assignation, le représentant de son orbite, est produite par paire réalisable.
+        """
+        return (
+            (center_id, size, activities_in_use, self.canonical_representative(activities_in_use, center_id, size))
+            for center_id, size, activities_in_use in self.iter_pairs()
+        )
 
-    def find_nash_stable_assignment(self) -> Dict[str, str]:
+    def find_nash_stable_assignment(self, max_workers: int = 1) -> Dict[str, str]:
         """
         Cherche une assignation stable de Nash en utilisant la technique du colour-coding.
+        Les paires (centre, combinaison) sont indépendantes : sur demande, elles sont découpées par lots à mesure
+        qu'elles sont générées et réparties entre plusieurs processus. Les lots sont lus dans l'ordre de soumission,
+        et ceux encore en attente sont annulés dès qu'une assignation stable est trouvée.
 
+        :param max_workers: Nombre de processus (1 par défaut : recherche séquentielle, arrêtée au premier succès).
         :return: Assignation trouvée ou None si aucune assignation n'est trouvée.
         """
-        center_guesses = self.guess_center_assignment()
-        activity_guesses = self.guess_activities_in_use()
+        result = None
+        if max_workers <= 1:
+            # Le prédicat n'est évalué qu'une fois par paire, sur son assignation représentative ; une paire réalisable
+            # est toujours stable, il ne fait donc que confirmer
+            for center_id, size, activities_in_use, leaf_assignment in self.iter_candidates():
+                if _is_stable(leaf_assignment, center_id, size, activities_in_use, self._void_id):
+                    result = center_id, leaf_assignment
+                    break
+        else:
+            pairs = self.iter_pairs()
+            batches = iter(lambda: list(itertools.islice(pairs, _PAIRS_PER_TASK)), [])
+            search = functools.partial(_search_pairs, num_leaves=self._num_leaves, void_id=self._void_id)
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                # Fenêtre bornée de tâches en vol : les lots suivants ne sont découpés qu'au fur et à mesure
+                pending = collections.deque(
+                    executor.submit(search, batch) for batch in itertools.islice(batches, 2 * max_workers)
+                )
+                while pending:
+                    result = pending.popleft().result()
+                    if result is not None:
+                        for future in pending:
+                            future.cancel()
+                        break
+                    pending.extend(executor.submit(search, batch) for batch in itertools.islice(batches, 1))
 
-        for center_assignment in center_guesses:
-            for activities_in_use in activity_guesses:
-                random_colours = self.random_colouring(activities_in_use)
-                for colouring in random_colours:
-                    if self.is_assignment_stable(center_assignment, activities_in_use, colouring):
-                        return {**colouring, self.central_player: center_assignment[0]}
+        if result is not None:
+            center_id, leaf_assignment = result
+            assignment = {
+                leaf: self._activity_names[activity] for leaf, activity in zip(self.leaf_players, leaf_assignment)
+            }
+            return {**assignment, self.central_player: self._activity_names[center_id]}
 
         return None
 